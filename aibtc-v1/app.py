@@ -1,20 +1,26 @@
+import requests
 import streamlit as st
-from components.agents_tab import render_agents_tab
-from components.execution_tab import render_execution_tab
-from components.tasks_tab import render_tasks_tab
-from components.tools_tab import render_tools_tab
 from crews.user_chat_specialist import render_crew
 from utils.session import init_session_state
 
 
+@st.cache_resource
+def get_logo_bytes(url: str) -> bytes:
+    # fetch the logo once and share it across reruns/sessions; raising on
+    # failure keeps st.cache_resource from caching a bad response forever
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.content
+
+
 # set up streamlit page
 st.set_page_config(
     page_title="AIBTC Crews",
     layout="wide",
 )
 
-# custom css styling
-custom_styles = """
+# custom css styling, defined once at module level
+CUSTOM_STYLES = """
 <style>
 /* load regular custom font */
 @font-face {
@@ -170,7 +176,7 @@ button[data-baseweb="tab"] > div[data-testid="stMarkdownContainer"] > p {
 }
 </style>
 """
-st.write(custom_styles, unsafe_allow_html=True)
+st.markdown(CUSTOM_STYLES, unsafe_allow_html=True)
 
 
 # initialize session state
@@ -178,10 +184,14 @@ init_session_state()
 
 
 # Display logo full width
-st.image(
-    "https://aibtc.dev/logos/aibtcdev-primary-logo-white-wide-1000px.png",
-    use_column_width=True,
-)
+LOGO_URL = "https://aibtc.dev/logos/aibtcdev-primary-logo-white-wide-1000px.png"
+try:
+    logo = get_logo_bytes(LOGO_URL)
+except requests.RequestException:
+    # fall back to letting the browser fetch the URL directly instead of
+    # taking the whole page down when the CDN is unreachable
+    logo = LOGO_URL
+st.image(logo, use_column_width=True)
 
 # Add icon links
 icon_links_html = """
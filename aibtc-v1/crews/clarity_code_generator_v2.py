@@ -1,9 +1,10 @@
-import inspect
+import json
 import os
 import streamlit as st
 from crewai import Agent, Task
-from crewai_tools import tool, Tool
+from crewai_tools import tool
 from textwrap import dedent
+from utils.callbacks import flush_crew_callbacks
 from utils.clarinet import ClarinetInterface
 from utils.clarity import clarityFunctionsList, clarityHints, clarityKeywordsList
 from utils.crews import AIBTC_Crew, display_token_usage
@@ -42,6 +43,7 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
             ),
             tools=[
                 AgentTools.create_clarinet_project,
+                AgentTools.create_project_with_contract,
             ],
             allow_delegation=False,
             memory=True,
@@ -89,6 +91,21 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
         )
         self.add_agent(clarity_code_reviewer)
 
+        requirements_analyst = Agent(
+            role="Requirements Analyst",
+            goal="Analyze the user's requirements and break them down into a clear specification for review.",
+            backstory=dedent(
+                "You are a skilled requirements analyst with experience in translating user requests into precise technical specifications for smart contracts. "
+                "Your goal is to identify the functions, data structures, and edge cases implied by the user's requirements so reviewers can verify the generated code against them."
+            ),
+            tools=[],
+            allow_delegation=False,
+            memory=True,
+            verbose=True,
+            llm=llm,
+        )
+        self.add_agent(requirements_analyst)
+
         clarity_code_reporter = Agent(
             role="Clarity Code Reporter",
             goal="Create a detailed report on the code quality, syntax check results, and any issues found.",
@@ -121,6 +138,8 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
         )
         self.add_task(create_clarinet_project)
 
+        # generation and requirements analysis only depend on the user input,
+        # so both run concurrently before the review stage
         generate_clarity_code = Task(
             description=(
                 f"Generate a Clarity code snippet for a smart contract on the Stacks blockchain based on the following user requirements: {user_input}. "
@@ -129,9 +148,21 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
             ),
             expected_output="The generated Clarity code snippet for the smart contract, saved in the Clarinet project.",
             agent=self.agents[2],  # clarity_code_generator
+            async_execution=True,
         )
         self.add_task(generate_clarity_code)
 
+        analyze_user_requirements = Task(
+            description=(
+                f"Analyze the following user requirements for a Clarity smart contract: {user_input}. "
+                "Identify the functions, data structures, and edge cases the contract must cover so the reviewer can verify the generated code against them."
+            ),
+            expected_output="A concise specification listing the required functions, data structures, and edge cases derived from the user requirements.",
+            agent=self.agents[4],  # requirements_analyst
+            async_execution=True,
+        )
+        self.add_task(analyze_user_requirements)
+
         # TODO: check for and add requirements
         # needs to be able to get all requirements currently in project
         # needs to be able to add requirements if needed before syntax check
@@ -140,13 +171,14 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
         review_clarity_code = Task(
             description=(
                 "Review the generated Clarity code by checking its syntax using your tools. "
+                "The syntax check tool returns JSON with keys ok, stdout, stderr, and returncode; the check passes only when ok is true. "
                 "Provide a detailed report on the code quality, syntax check results, and any issues found. "
-                f"Consider how well the code meets the original user requirements: {user_input}. "
+                f"Consider how well the code meets the requirements specification and the original user requirements: {user_input}. "
                 "Delegate to the Clarity Code Generator until the code passes the syntax check."
             ),
             expected_output="Once the syntax check passes, a detailed report on the code quality, syntax check results, and any issues found.",
             agent=self.agents[3],  # clarity_code_reviewer
-            context=[generate_clarity_code],
+            context=[generate_clarity_code, analyze_user_requirements],
         )
         self.add_task(review_clarity_code)
 
@@ -156,8 +188,8 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
                 f"Ensure that the output clearly shows how the code meets the original user requirements: {user_input}. "
             ),
             expected_output="The final output that includes the Clarity code, the code review report, and how it addresses the user's requirements.",
-            agent=self.agents[4],  # clarity_code_reporter
-            context=[generate_clarity_code, review_clarity_code],
+            agent=self.agents[5],  # clarity_code_reporter
+            context=[generate_clarity_code, analyze_user_requirements, review_clarity_code],
         )
         self.add_task(compile_clarity_code_report)
 
@@ -196,40 +228,19 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
                 st.session_state.crew_step_callback = []
                 st.session_state.crew_task_callback = []
 
-                # get LLM from session state
-                llm = st.session_state.llm
-
-                # create and run the crew
-                print("Creating Clarity Code Generator V2 Crew...")
-                clarity_code_generator_crew_class = ClarityCodeGeneratorCrewV2()
-                clarity_code_generator_crew_class.setup_agents(llm)
-                clarity_code_generator_crew_class.setup_tasks(user_input)
-                clarity_code_generator_crew = (
-                    clarity_code_generator_crew_class.create_crew()
-                )
+                # run the crew, cached on user_input so identical
+                # requirements return the stored result instantly
+                result_str, token_usage = generate_and_review_contract(user_input)
 
-                with st.spinner("Generating Clarity code..."):
-                    print("Running Clarity Code Generator V2 Crew...")
-                    result = clarity_code_generator_crew.kickoff()
+                # persist the result so widget-triggered reruns (like the
+                # download button) do not discard the generated code
+                st.session_state.clarity_generator_result = {
+                    "result": result_str,
+                    "token_usage": token_usage,
+                    "file_name": f"{get_timestamp()}_generated_clarity_code.clar",
+                }
 
                 st.success("Code generation complete!")
-
-                display_token_usage(result.token_usage)
-
-                st.subheader("Clarity Code Generation Results")
-
-                result_str = str(result.raw)
-                st.markdown(result_str)
-
-                timestamp = get_timestamp()
-                file_name = f"{timestamp}_generated_clarity_code.clar"
-
-                st.download_button(
-                    label="Download Clarity Code (Text)",
-                    data=result_str,
-                    file_name=file_name,
-                    mime="text/plain",
-                )
             except Exception as e:
                 st.error(f"Error during code generation: {e}")
                 st.error("Please check your inputs and try again.")
@@ -238,6 +249,39 @@ class ClarityCodeGeneratorCrewV2(AIBTC_Crew):
                 "Please enter your smart contract requirements and click 'Generate Clarity Code'."
             )
 
+        # render the last result from session state so it survives reruns
+        generated = st.session_state.get("clarity_generator_result")
+        if generated:
+            display_token_usage(generated["token_usage"])
+
+            st.subheader("Clarity Code Generation Results")
+
+            st.markdown(generated["result"])
+
+            st.download_button(
+                label="Download Clarity Code (Text)",
+                data=generated["result"],
+                file_name=generated["file_name"],
+                mime="text/plain",
+            )
+
+
+@st.cache_data(ttl=3600, show_spinner="Generating Clarity code...")
+def generate_and_review_contract(user_input: str):
+    """Run the full generate/review/compile crew for the given requirements.
+
+    Cached on user_input so re-submitting the same requirements returns the
+    stored result instead of re-running the multi-agent pipeline.
+    """
+    crew_class = ClarityCodeGeneratorCrewV2(st.session_state.embedder)
+    crew_class.setup_agents(st.session_state.llm)
+    crew_class.setup_tasks(user_input)
+    crew = crew_class.create_crew()
+    result = crew.kickoff()
+    # render anything async tasks buffered off-thread
+    flush_crew_callbacks()
+    return str(result.raw), result.token_usage
+
 
 #########################
 # Agent Tools
@@ -251,9 +295,14 @@ class AgentTools:
     @tool("Initialize Clarinet")
     def initialize_clarinet() -> str:
         """Initialize Clarinet by detecting the Clarinet binary and setting up the environment."""
-        AgentTools.clarinet_interface = ClarinetInterface()
+        # reuse the long-lived interface so repeat calls skip binary
+        # detection and environment setup
+        if AgentTools.clarinet_interface:
+            return "Clarinet is already initialized."
+        clarinet_interface = ClarinetInterface()
         try:
-            AgentTools.clarinet_interface.initialize_clarinet()
+            clarinet_interface.initialize_clarinet()
+            AgentTools.clarinet_interface = clarinet_interface
             return "Clarinet initialized successfully."
         except Exception as e:
             return f"Error initializing Clarinet: {str(e)}"
@@ -271,6 +320,23 @@ class AgentTools:
             return f"Error creating Clarinet project: {result['stdout'] + result['stderr']}"
         return f"Successfully created new Clarinet project: {project_name}\n{result['stdout']}"
 
+    @staticmethod
+    @tool("Create Project With Contract")
+    def create_project_with_contract(
+        project_name: str, contract_name: str, contract_code: str
+    ) -> str:
+        """Create a Clarinet project and add a smart contract with the given code in a single step."""
+        if not AgentTools.clarinet_interface:
+            return (
+                "Error: Clarinet is not initialized. Please initialize Clarinet first."
+            )
+        result = AgentTools.clarinet_interface.create_project_with_contract(
+            project_name, contract_name, contract_code
+        )
+        if result["returncode"] != 0:
+            return f"Error creating project with contract: {result['stdout'] + result['stderr']}"
+        return f"Successfully created project '{project_name}' with contract '{contract_name}'.\n{result['stdout']}"
+
     @staticmethod
     @tool("Add New Smart Contract")
     def add_new_smart_contract(contract_name: str, contract_code: str) -> str:
@@ -315,35 +381,44 @@ class AgentTools:
             return f"Error updating smart contract: {result['stderr']}"
         return f"Successfully updated contract '{contract_name}'\n{result['stdout']}"
 
+    @staticmethod
+    def _syntax_check_payload(result: dict) -> str:
+        # compact JSON with the full check result, so the reviewer can
+        # reason from a single tool call instead of re-querying
+        return json.dumps(
+            {
+                "ok": result["returncode"] == 0,
+                "stdout": result["stdout"],
+                "stderr": result["stderr"],
+                "returncode": result["returncode"],
+            }
+        )
+
     @staticmethod
     @tool("Check All Smart Contracts Syntax")
     def check_all_smart_contract_syntax() -> str:
-        """Check the syntax of all of the smart contracts in the Clarinet project."""
+        """Check the syntax of all of the smart contracts in the Clarinet project.
+        Returns a JSON object with keys: ok, stdout, stderr, returncode."""
         if (
             not AgentTools.clarinet_interface
             or not AgentTools.clarinet_interface.project_dir
         ):
             return "Error: Clarinet project is not created. Please create a Clarinet project first."
         result = AgentTools.clarinet_interface.check_all_contracts()
-        if result["returncode"] != 0:
-            return f"Syntax errors found:\n{result['stdout']}\n{result['stderr']}"
-        return f"Syntax check passed:\n{result['stdout']}"
+        return AgentTools._syntax_check_payload(result)
 
     @staticmethod
     @tool("Check Smart Contract Syntax")
     def check_single_smart_contract_syntax(contract_name: str) -> str:
-        """Check the syntax of a specific smart contract in the Clarinet project."""
+        """Check the syntax of a specific smart contract in the Clarinet project.
+        Returns a JSON object with keys: ok, stdout, stderr, returncode."""
         if (
             not AgentTools.clarinet_interface
             or not AgentTools.clarinet_interface.project_dir
         ):
             return "Error: Clarinet project is not created. Please create a Clarinet project first."
         result = AgentTools.clarinet_interface.check_contract(contract_name)
-        if result["returncode"] != 0:
-            return f"Syntax errors found for contract '{contract_name}':\n{result['stdout']}\n{result['stderr']}"
-        return (
-            f"Syntax check passed for contract '{contract_name}':\n{result['stdout']}"
-        )
+        return AgentTools._syntax_check_payload(result)
 
     @staticmethod
     @tool("Add Mainnet Contract as Requirement")
@@ -361,11 +436,15 @@ class AgentTools:
 
     @classmethod
     def get_all_tools(cls):
-        members = inspect.getmembers(cls)
-        tools = [
-            member
-            for name, member in members
-            if isinstance(member, Tool)
-            or (hasattr(member, "__wrapped__") and isinstance(member.__wrapped__, Tool))
+        # explicit registry instead of an inspect.getmembers scan,
+        # which instantiated every class attribute on each call
+        return [
+            cls.initialize_clarinet,
+            cls.create_clarinet_project,
+            cls.create_project_with_contract,
+            cls.add_new_smart_contract,
+            cls.update_smart_contract,
+            cls.check_all_smart_contract_syntax,
+            cls.check_single_smart_contract_syntax,
+            cls.add_mainnet_contract_as_requirement,
         ]
-        return tools
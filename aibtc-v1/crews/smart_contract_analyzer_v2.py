@@ -1,8 +1,17 @@
-import inspect
+import hashlib
+import json
+import os
+import re
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import streamlit as st
 from crewai import Agent, Task
-from crewai_tools import tool, Tool
+from crewai_tools import tool
+from pydantic import BaseModel
 from textwrap import dedent
+from utils.callbacks import flush_crew_callbacks
 from utils.clarity import clarityHints
 from utils.crews import AIBTC_Crew, display_token_usage
 from utils.scripts import BunScriptRunner, get_timestamp
@@ -121,6 +130,81 @@ reviewFormat = """
 """
 
 
+# the stage 3 review prompts are fully static, so dedent them once at
+# import instead of on every setup_tasks call / Streamlit rerun
+reviewTaskDescriptions = {
+    "complex_logic": dedent(
+        """
+        Review the complex logic identified in the previous stages for potential flaws and consider the following:
+        - Complex logic should be broken down into smaller, more manageable parts.
+        - Edge cases and potential vulnerabilities should be identified and addressed.
+        """
+    ),
+    "fee_validation": dedent(
+        """
+        Review the validation of fees and token transfers for potential issues and consider the following:
+        - Fees and token transfers should be validated to prevent zero or unintended values.
+        - Edge cases and potential vulnerabilities should be identified and addressed.
+        """
+    ),
+    "input_validation": dedent(
+        """
+        Review the validation of user-provided inputs for potential vulnerabilities and consider the following:
+        - User inputs should be properly validated to prevent vulnerabilities.
+        - Edge cases and potential vulnerabilities should be identified and addressed.
+        """
+    ),
+    "pause_resume": dedent(
+        """
+        Review the mechanisms for pausing and resuming contract operations for potential issues and consider the following:
+        - Pause functionality should include a way to resume to prevent permanent contract lockout.
+        - Edge cases and potential vulnerabilities should be identified and addressed.
+        """
+    ),
+    "edge_cases": dedent(
+        """
+        Review the contract for potential edge cases and consider the following:
+        - Edge cases should be identified and tested to ensure the contract behaves as expected.
+        - Potential vulnerabilities should be identified and addressed.
+        """
+    ),
+}
+
+reviewTaskOutputs = {
+    "complex_logic": "An analysis of complex logic segments with any reported issues and recommended fixes.",
+    "fee_validation": "An analysis of fee validation and token transfer logic with any reported issues and recommended fixes.",
+    "input_validation": "An analysis of input validation logic with any reported issues and recommended fixes.",
+    "pause_resume": "An analysis of pause and resume mechanisms with any reported issues and recommended fixes.",
+    "edge_cases": "An analysis of edge cases with any reported issues and recommended fixes.",
+}
+
+reviewTaskOutputs = {
+    key: dedent(
+        f"""
+        {summary}
+        Do not include any new or modified contract code, only the analysis and recommendations.
+        This should follow the strict Markdown format defined below:
+        {taskReportFormat}
+        """
+    )
+    for key, summary in reviewTaskOutputs.items()
+}
+
+
+class RiskClassification(BaseModel):
+    """Risk buckets for every function in the contract under audit.
+
+    Each bucket holds "function-name: short description" strings; functions
+    that do not clearly fit a bucket land in `missing`.
+    """
+
+    green: list[str] = []
+    yellow: list[str] = []
+    orange: list[str] = []
+    red: list[str] = []
+    missing: list[str] = []
+
+
 class SmartContractAnalyzerV2(AIBTC_Crew):
     def __init__(self, embedder):
         super().__init__(
@@ -130,23 +214,14 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
         )
 
     def setup_agents(self, llm):
-        # contract retrieval agent
-        contract_retrieval_agent = Agent(
-            role="Contract Retrieval Expert",
-            goal="To retrieve the contract code for analysis.",
-            backstory=dedent(
-                """
-                You are a contract retrieval agent with expertise in fetching contract code and functions for analysis.,
-                Your role is crucial in providing the necessary data for the audit team to perform their tasks effectively.,
-                You always use the fully qualified contract name (ADDRESS.CONTRACT_NAME) to ensure accurate retrieval.,
-                """
-            ),
-            tools=[AgentTools.get_contract_source_code],
-            verbose=True,
-            allow_delegation=False,
-            llm=llm,
-        )
-        self.add_agent(contract_retrieval_agent)
+        # agent construction is identical for every contract, so reuse the
+        # validated Agent objects across reruns as long as the LLM is the
+        # same; the crew cache in render_crew is keyed per contract and
+        # would otherwise rebuild both agents on every new identifier
+        cached = st.session_state.get("analyzer_agents")
+        if cached and cached[0] == id(llm):
+            self.agents = list(cached[1])
+            return
 
         # contract analysis agent
         contract_analysis_agent = Agent(
@@ -183,6 +258,8 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
         )
         self.add_agent(contract_report_writer)
 
+        st.session_state.analyzer_agents = (id(llm), list(self.agents))
+
     def setup_tasks(self, contract_identifier):
         # TODO: add names to all tasks!
 
@@ -190,18 +267,40 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
         # STAGE 1: PREP THE INFORMATION
         #
 
-        # get the contract code
-        get_contract_code = Task(
-            description=f"Retrieve the contract code for analysis. User Input: {contract_identifier}",
-            expected_output="The contract code for analysis in raw format with no modifications or additional output.",
-            agent=self.agents[0],  # contract retrieval agent
-            context=[],
+        # fetch the contract source once up front (cached) instead of
+        # spending an agent round-trip on retrieval and re-passing the
+        # retrieval task output as context to every downstream task
+        result = fetch_contract_source(contract_identifier)
+        if not result["success"]:
+            raise ValueError(
+                f"Failed to retrieve contract source for {contract_identifier}: {result['error']}"
+            )
+        contract_code_block = (
+            f"### Contract Source for {contract_identifier}\n\n{result['output']}"
         )
-        self.add_task(get_contract_code)
+
+        def with_contract_source(text):
+            # share the prefetched source with a task without a Task dependency;
+            # the source goes first as a byte-identical prefix across all tasks
+            # so provider-side prompt/prefix caching can reuse it instead of
+            # re-processing the full contract for every task
+            return f"{contract_code_block}\n\n{text}"
+
+        # deterministic function inventory from a cheap regex scan; the
+        # symbolic tasks start from this list instead of re-deriving it
+        inventory_block = (
+            "### Function Inventory\n\n```json\n"
+            f"{parse_contract_functions(result['output'])}\n```"
+        )
+
+        def with_function_inventory(text):
+            # keep the contract source as the leading shared prefix and
+            # append the inventory after the task-specific instructions
+            return with_contract_source(f"{text}\n\n{inventory_block}")
 
         # what is the general purpose of the contract
         general_concept = Task(
-            description="Given the contract code, what is the general concept of the contract?",
+            description=with_contract_source("Given the contract code, what is the general concept of the contract?"),
             expected_output=dedent(
                 f"""
                 A summary of the contract's purpose and functionality.
@@ -209,29 +308,29 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(general_concept)
 
         # create list of functions that use traits
         trait_functions = Task(
-            description="Help identify and categorize functions that take traits as arguments.",
-            expected_output=(
+            description=with_function_inventory("Help identify and categorize functions that take traits as arguments."),
+            expected_output=dedent(
                 f"""
-                A list of functions that take traits as arguments with descriptions of what each function does. 
+                A list of functions that take traits as arguments with descriptions of what each function does.
                 This should follow the strict Markdown format defined below:
                 {taskListFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(trait_functions)
 
         # check for functions that use as-contract
         as_contract_functions = Task(
-            description="Help identify and categorize functions that use `as-contract` with `contract-call?`.",
+            description=with_function_inventory("Help identify and categorize functions that use `as-contract` with `contract-call?`."),
             expected_output=dedent(
                 f"""
                 A list of functions that use `as-contract` with `contract-call?` with descriptions of what each function does.
@@ -239,129 +338,49 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskListFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(as_contract_functions)
 
-        # check for green functions
-        green_functions = Task(
-            description=dedent(
-                f"""
-                Help identify and categorize functions that would be considered GREEN in terms of risk.
-                GREEN - harmless, do not participate in anything super important, in most cases it will be just a read-only function that returns value stored on-chain.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                A list of functions with a short description categorized as GREEN based on their risk levels.
-                This should follow the strict Markdown format defined below:
-                {taskListFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
-        )
-        self.add_task(green_functions)
-
-        # check for yellow functions
-        yellow_functions = Task(
-            description=dedent(
-                f"""
-                Help identify and categorize functions that would be considered YELLOW in terms of risk.
-                YELLOW - can change value of variable of map entry, but they are not used to anything critical. In most cases it will functions that can modify meta-data stored on chain.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                A list of functions categorized as YELLOW based on their risk levels.
-                This should follow the strict Markdown format defined below:
-                {taskListFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
-        )
-        self.add_task(yellow_functions)
-
-        # check for orange functions
-        orange_functions = Task(
-            description=dedent(
-                f"""
-                Help identify and categorize functions that would be considered ORANGE in terms of risk.
-                ORANGE - functions without side-effects used by functions with side-effects and functions with side-effects that can alter contract behavior but not in a way that can lead to theft, funds loss or contract lock.
+        # classify every function into a risk bucket in a single pass
+        # instead of one round-trip (and one copy of the contract) per color
+        classify_functions = Task(
+            description=with_function_inventory(dedent(
                 """
-            ),
-            expected_output=dedent(
-                f"""
-                A list of functions categorized as ORANGE based on their risk levels.
-                This should follow the strict Markdown format defined below:
-                {taskListFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
-        )
-        self.add_task(orange_functions)
-
-        # check for red functions
-        red_functions = Task(
-            description=dedent(
-                f"""
-                Help identify and categorize functions that would be considered RED in terms of risk.
-                RED - functions that can lead to theft, funds loss or contract lock.
+                Classify every function in the contract into exactly one risk bucket:
+                - GREEN - harmless, do not participate in anything super important, in most cases it will be just a read-only function that returns value stored on-chain.
+                - YELLOW - can change value of variable of map entry, but they are not used to anything critical. In most cases it will functions that can modify meta-data stored on chain.
+                - ORANGE - functions without side-effects used by functions with side-effects and functions with side-effects that can alter contract behavior but not in a way that can lead to theft, funds loss or contract lock.
+                - RED - functions that can lead to theft, funds loss or contract lock.
+                Put any function that does not clearly fit one of the buckets into `missing`.
                 """
-            ),
+            )),
             expected_output=dedent(
-                f"""
-                A list of functions categorized as RED based on their risk levels.
-                This should follow the strict Markdown format defined below:
-                {taskListFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
-        )
-        self.add_task(red_functions)
-
-        # check for missing functions
-        missing_functions = Task(
-            description=dedent(
                 """
-                Help identify and categorize functions that are missing from the provided lists.
-                Only include a function if it is missing from all categories.
+                A JSON object with keys green, yellow, orange, red, and missing,
+                each holding a list of "function-name: short description" strings.
+                Every function in the contract must appear in exactly one list.
                 """
             ),
-            expected_output=dedent(
-                f"""
-                A list of functions in the contract code that are missing from the provided categories.
-                This should follow the strict Markdown format defined below:
-                {taskListFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[
-                get_contract_code,
-                green_functions,
-                yellow_functions,
-                orange_functions,
-                red_functions,
-            ],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
+            output_pydantic=RiskClassification,
         )
-        self.add_task(missing_functions)
+        self.add_task(classify_functions)
 
         #
         # STAGE 2 - ANALYZE THE CATEGORIES
         #
 
         analyze_trait_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the functions that take traits as arguments for correctness and consider the following:
                 - Traits should be used correctly and consistently throughout the contract.
                 - Functions should to be written with the assumption that the supplied contract is malicious and cannot be trusted at any point in time
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of trait functions with any reported issues and recommended fixes.
@@ -371,19 +390,19 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {codeReferences}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, trait_functions],
+            agent=self.agents[0],  # contract analysis agent
+            context=[trait_functions],
         )
         self.add_task(analyze_trait_functions)
 
         analyze_as_contract_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the functions that use `as-contract` with `contract-call?` for correctness and consider the following:
                 - `as-contract` function is used to switch calling context from user to contract.
                 - The use of `as-contract` should be appropriate and secure.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of functions using `as-contract` with `contract-call?` with any reported issues and recommended fixes.
@@ -393,19 +412,19 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {codeReferences}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, as_contract_functions],
+            agent=self.agents[0],  # contract analysis agent
+            context=[as_contract_functions],
         )
         self.add_task(analyze_as_contract_functions)
 
         analyze_green_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the GREEN functions for correctness and consider the following:
                 - Functions that are read-only should not have any side-effects.
                 - Example: A function that returns the balance of an account should not modify the balance.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of GREEN functions with any reported issues and recommended fixes.
@@ -414,20 +433,20 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, green_functions],
+            agent=self.agents[0],  # contract analysis agent
+            context=[classify_functions],
         )
         self.add_task(analyze_green_functions)
 
         analyze_yellow_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the YELLOW functions for proper authorization and access control and consider the following:
                 - Functions that can be called by people who shouldn't be able to call them must be fixed.
                 - Example: Function that allows to change token URI can be executed successfully by anyone, but only admin should be allowed to do that.
                 - Functions secured using `tx-sender` or `contract-caller` value must be triple checked. If values they change aren't critical (used to secure other functions) they are OK.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of YELLOW functions with any reported issues and recommended fixes.
@@ -436,20 +455,20 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, yellow_functions],
+            agent=self.agents[0],  # contract analysis agent
+            context=[classify_functions],
         )
         self.add_task(analyze_yellow_functions)
 
         analyze_orange_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the ORANGE functions for proper authorization, access control, and security vulnerabilities and consider the following:
                 - Functions with side-effects (minting, transferring, burning STX/FT/NFT) must be secured properly.
                 - Who can perform each action should be documented and verified as part of the report.
                 - Functions secured using `tx-sender` or `contract-caller` value must be triple checked.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of ORANGE functions with any reported issues and recommended fixes.
@@ -458,20 +477,20 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, orange_functions],
+            agent=self.agents[0],  # contract analysis agent
+            context=[classify_functions],
         )
         self.add_task(analyze_orange_functions)
 
         analyze_red_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the provided functions as RED functions for critical security issues and consider the following:
                 - Functions that can lead to theft, funds loss or contract lock must be secured properly.
                 - Who can perform each action should be documented and verified as part of the report.
                 - Functions secured using `tx-sender` or `contract-caller` value must be triple checked.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of RED functions with any reported issues and recommended fixes.
@@ -480,21 +499,18 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[
-                get_contract_code,
-                red_functions,
-            ],
+            agent=self.agents[0],  # contract analysis agent
+            context=[classify_functions],
         )
         self.add_task(analyze_red_functions)
 
         analyze_missing_functions = Task(
-            description=dedent(
+            description=with_contract_source(dedent(
                 f"""
                 Analyze the missing functions for potential risks and consider the following:
                 - Missing functions were not categorized and should be reviewed thoroughly for potential security vulnerabilities.
                 """
-            ),
+            )),
             expected_output=dedent(
                 f"""
                 An analysis of missing functions with any reported issues and recommended fixes.
@@ -503,11 +519,8 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {taskReportFormat}
                 """
             ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[
-                get_contract_code,
-                missing_functions,
-            ],
+            agent=self.agents[0],  # contract analysis agent
+            context=[classify_functions],
         )
         self.add_task(analyze_missing_functions)
 
@@ -516,107 +529,42 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
         #
 
         review_complex_logic = Task(
-            description=dedent(
-                f"""
-                Review the complex logic identified in the previous stages for potential flaws and consider the following:
-                - Complex logic should be broken down into smaller, more manageable parts.
-                - Edge cases and potential vulnerabilities should be identified and addressed.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                An analysis of complex logic segments with any reported issues and recommended fixes.
-                Do not include any new or modified contract code, only the analysis and recommendations.
-                This should follow the strict Markdown format defined below:
-                {taskReportFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            description=with_contract_source(reviewTaskDescriptions["complex_logic"]),
+            expected_output=reviewTaskOutputs["complex_logic"],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(review_complex_logic)
 
         review_fee_validation = Task(
-            description=dedent(
-                f"""
-                Review the validation of fees and token transfers for potential issues and consider the following:
-                - Fees and token transfers should be validated to prevent zero or unintended values.
-                - Edge cases and potential vulnerabilities should be identified and addressed.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                An analysis of fee validation and token transfer logic with any reported issues and recommended fixes.
-                Do not include any new or modified contract code, only the analysis and recommendations.
-                This should follow the strict Markdown format defined below:
-                {taskReportFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            description=with_contract_source(reviewTaskDescriptions["fee_validation"]),
+            expected_output=reviewTaskOutputs["fee_validation"],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(review_fee_validation)
 
         review_input_validation = Task(
-            description=dedent(
-                f"""
-                Review the validation of user-provided inputs for potential vulnerabilities and consider the following:
-                - User inputs should be properly validated to prevent vulnerabilities.
-                - Edge cases and potential vulnerabilities should be identified and addressed.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                An analysis of input validation logic with any reported issues and recommended fixes.
-                Do not include any new or modified contract code, only the analysis and recommendations.
-                This should follow the strict Markdown format defined below:
-                {taskReportFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            description=with_contract_source(reviewTaskDescriptions["input_validation"]),
+            expected_output=reviewTaskOutputs["input_validation"],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(review_input_validation)
 
         review_pause_resume = Task(
-            description=dedent(
-                f"""
-                Review the mechanisms for pausing and resuming contract operations for potential issues and consider the following:
-                - Pause functionality should include a way to resume to prevent permanent contract lockout.
-                - Edge cases and potential vulnerabilities should be identified and addressed.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                An analysis of pause and resume mechanisms with any reported issues and recommended fixes.
-                Do not include any new or modified contract code, only the analysis and recommendations.
-                This should follow the strict Markdown format defined below:
-                {taskReportFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code],
+            description=with_contract_source(reviewTaskDescriptions["pause_resume"]),
+            expected_output=reviewTaskOutputs["pause_resume"],
+            agent=self.agents[0],  # contract analysis agent
+            async_execution=True,
         )
         self.add_task(review_pause_resume)
 
         review_edge_cases = Task(
-            description=dedent(
-                f"""
-                Review the contract for potential edge cases and consider the following:
-                - Edge cases should be identified and tested to ensure the contract behaves as expected.
-                - Potential vulnerabilities should be identified and addressed.
-                """
-            ),
-            expected_output=dedent(
-                f"""
-                An analysis of edge cases with any reported issues and recommended fixes.
-                Do not include any new or modified contract code, only the analysis and recommendations.
-                This should follow the strict Markdown format defined below:
-                {taskReportFormat}
-                """
-            ),
-            agent=self.agents[1],  # contract analysis agent
-            context=[get_contract_code, review_complex_logic],
+            description=with_contract_source(reviewTaskDescriptions["edge_cases"]),
+            expected_output=reviewTaskOutputs["edge_cases"],
+            agent=self.agents[0],  # contract analysis agent
+            context=[review_complex_logic],
         )
         self.add_task(review_edge_cases)
 
@@ -635,18 +583,14 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {analysisFormat}
                 """
             ),
-            agent=self.agents[2],  # contract report writer
+            agent=self.agents[1],  # contract report writer
             context=[
                 general_concept,
-                green_functions,
+                classify_functions,
                 analyze_green_functions,
-                yellow_functions,
                 analyze_yellow_functions,
-                orange_functions,
                 analyze_orange_functions,
-                red_functions,
                 analyze_red_functions,
-                missing_functions,
                 analyze_missing_functions,
             ],
         )
@@ -662,7 +606,7 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 {reviewFormat}
                 """
             ),
-            agent=self.agents[2],  # contract report writer
+            agent=self.agents[1],  # contract report writer
             context=[
                 review_complex_logic,
                 review_fee_validation,
@@ -687,7 +631,7 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 ## Additional Comments
                 """
             ),
-            agent=self.agents[2],  # contract report writer
+            agent=self.agents[1],  # contract report writer
             context=[compile_analysis, compile_review],
         )
         self.add_task(final_report)
@@ -713,6 +657,18 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
             submitted = st.form_submit_button("Analyze Contract")
 
         if submitted and contract_identifier:
+            # reject malformed identifiers before spending a crew run on them
+            address, contract_name = parse_contract_identifier(
+                contract_identifier.strip()
+            )
+            if address is None:
+                st.error(
+                    "Invalid contract identifier. Expected ADDRESS.CONTRACT_NAME, "
+                    "e.g. SP000000000000000000002Q6VF78.pox"
+                )
+                return
+            contract_identifier = f"{address}.{contract_name}"
+
             st.subheader("Analysis Progress")
             try:
                 # create containers for real-time updates
@@ -728,37 +684,72 @@ class SmartContractAnalyzerV2(AIBTC_Crew):
                 # get LLM from session state
                 llm = st.session_state.llm
 
-                # Create an instance of SmartContractAnalyzerV2
-                smart_contract_analyzer_crew_class = SmartContractAnalyzerV2()
-                smart_contract_analyzer_crew_class.setup_agents(llm)
-                smart_contract_analyzer_crew_class.setup_tasks(contract_identifier)
-                smart_contract_analyzer_crew = (
-                    smart_contract_analyzer_crew_class.create_crew()
-                )
-
-                with st.spinner("Analyzing..."):
+                # rebuild the crew only when the model or target contract
+                # changes; agent and task construction is not free (pydantic
+                # validation, tool binding) and form reruns are frequent
+                crew_key = (id(llm), contract_identifier)
+                if st.session_state.get("analyzer_crew_key") != crew_key:
+                    smart_contract_analyzer_crew_class = SmartContractAnalyzerV2(
+                        st.session_state.embedder
+                    )
+                    smart_contract_analyzer_crew_class.setup_agents(llm)
+                    smart_contract_analyzer_crew_class.setup_tasks(contract_identifier)
+                    st.session_state.analyzer_crew = (
+                        smart_contract_analyzer_crew_class.create_crew()
+                    )
+                    st.session_state.analyzer_crew_key = crew_key
+                smart_contract_analyzer_crew = st.session_state.analyzer_crew
+
+                # warn up front when the contract alone eats most of the
+                # context window, before any tokens are spent on the audit
+                source = fetch_contract_source(contract_identifier)
+                if source["success"]:
+                    token_estimate = estimate_token_count(source["output"])
+                    if token_estimate > CONTRACT_TOKEN_BUDGET:
+                        st.warning(
+                            f"This contract is roughly {token_estimate:,} tokens; "
+                            "the compile stages may hit the model's context "
+                            "limit and truncate results."
+                        )
+
+                # the step/task callbacks stream intermediate outputs into
+                # the containers above while kickoff runs, so the user sees
+                # each task's result as it completes instead of a blank
+                # spinner for the whole audit
+                with st.status("Analyzing contract...", expanded=True) as status:
                     result = smart_contract_analyzer_crew.kickoff()
+                    # render anything async tasks buffered off-thread
+                    flush_crew_callbacks()
+                    status.update(
+                        label="Analysis complete!", state="complete", expanded=False
+                    )
+
+                # persist the result (and the report's timestamped file name)
+                # so reruns triggered by widgets like the download button
+                # re-render the report instead of losing it
+                st.session_state.analyzer_result = {
+                    "result": str(result.raw),
+                    "token_usage": result.token_usage,
+                    "file_name": f"{get_timestamp()}_smart_contract_analysis.txt",
+                }
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+                st.error("Please check your inputs and try again.")
 
-                st.success("Analysis complete!")
-
-                display_token_usage(result.token_usage)
-
-                st.subheader("Analysis Results")
+        analyzer_result = st.session_state.get("analyzer_result")
+        if analyzer_result:
+            display_token_usage(analyzer_result["token_usage"])
 
-                result_str = str(result.raw)
-                st.markdown(result_str)
+            st.subheader("Analysis Results")
 
-                timestamp = get_timestamp()
+            st.markdown(analyzer_result["result"])
 
-                st.download_button(
-                    label="Download Analysis Report (Text)",
-                    data=result_str,
-                    file_name=f"{timestamp}_smart_contract_analysis.txt",
-                    mime="text/plain",
-                )
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-                st.error("Please check your inputs and try again.")
+            st.download_button(
+                label="Download Analysis Report (Text)",
+                data=analyzer_result["result"],
+                file_name=analyzer_result["file_name"],
+                mime="text/plain",
+            )
         else:
             st.write(
                 "Enter Contract Address and Contract Name, then click 'Analyze Contract' to see results."
@@ -779,20 +770,26 @@ class AgentTools:
         # see if the contract name is in the format { contract_name: value }
         if isinstance(contract_name, dict) and "contract_name" in contract_name:
             contract_name = contract_name["contract_name"]
-        return BunScriptRunner.bun_run(
-            "stacks-contracts", "get-contract-source-code.ts", contract_name
-        )
+        return fetch_contract_source(contract_name)
+
+    @staticmethod
+    @tool("Get source code for multiple contracts")
+    def get_contract_source_codes_batch(contract_names: list):
+        """Get the source code for several contracts at once. Each entry must be a fully qualified ADDRESS.CONTRACT_NAME identifier."""
+        # overlap the first-time fetches; the fetch is network-bound and
+        # cached results return immediately without touching the pool
+        with ThreadPoolExecutor(max_workers=min(8, len(contract_names) or 1)) as pool:
+            results = list(pool.map(fetch_contract_source, contract_names))
+        return dict(zip(contract_names, results))
 
     @classmethod
     def get_all_tools(cls):
-        members = inspect.getmembers(cls)
-        tools = [
-            member
-            for name, member in members
-            if isinstance(member, Tool)
-            or (hasattr(member, "__wrapped__") and isinstance(member.__wrapped__, Tool))
+        # explicit registry instead of an inspect.getmembers scan,
+        # which instantiated every class attribute on each call
+        return [
+            cls.get_contract_source_code,
+            cls.get_contract_source_codes_batch,
         ]
-        return tools
 
 
 #########################
@@ -800,8 +797,138 @@ class AgentTools:
 #########################
 
 
+CONTRACT_CACHE_DIR = os.path.expanduser("~/.aibtc_cache/contracts")
+CONTRACT_CACHE_TTL = 3600  # seconds
+
+# contracts above this rough token count risk overflowing the compile
+# stages, which stack many prior task outputs on top of the source
+CONTRACT_TOKEN_BUDGET = 20000
+
+# in-memory cache of successful fetches keyed by contract identifier
+_contract_source_cache = {}
+
+
+def _fetch_contract_source_api(contract_name: str):
+    # the Bun script ultimately performs this same GET; calling the API
+    # in-process avoids forking a Bun interpreter per fetch
+    address, name = parse_contract_identifier(contract_name)
+    if not address:
+        return {
+            "output": "",
+            "error": f"Invalid contract identifier: {contract_name}",
+            "success": False,
+        }
+    url = f"https://api.mainnet.hiro.so/v2/contracts/source/{address}/{name}"
+    try:
+        response = requests.get(url, params={"proof": 0}, timeout=10)
+        response.raise_for_status()
+        return {"output": response.json()["source"], "error": None, "success": True}
+    except (requests.RequestException, KeyError, ValueError) as e:
+        return {"output": "", "error": str(e), "success": False}
+
+
+def fetch_contract_source(contract_name: str):
+    """Fetch contract source code with an in-memory and on-disk cache.
+
+    Contract source is immutable once deployed, so repeat requests within a
+    crew run (and across runs, via the on-disk copy) skip the subprocess
+    spawn and network round-trip entirely.
+    """
+    if contract_name in _contract_source_cache:
+        return _contract_source_cache[contract_name]
+
+    cache_file = os.path.join(
+        CONTRACT_CACHE_DIR,
+        f"{hashlib.sha256(contract_name.encode()).hexdigest()}.json",
+    )
+    if (
+        os.path.exists(cache_file)
+        and time.time() - os.path.getmtime(cache_file) < CONTRACT_CACHE_TTL
+    ):
+        with open(cache_file, "r") as f:
+            result = json.load(f)
+        _contract_source_cache[contract_name] = result
+        return result
+
+    result = _fetch_contract_source_api(contract_name)
+    if not result["success"]:
+        # fall back to the Bun script if the direct API call fails
+        result = BunScriptRunner.bun_run(
+            "stacks-contracts", "get-contract-source-code.ts", contract_name
+        )
+    if result["success"]:
+        _contract_source_cache[contract_name] = result
+        os.makedirs(CONTRACT_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_file, cache_file)
+    return result
+
+
+_DEFINE_FUNCTION_RE = re.compile(r"\(define-(public|private|read-only)\s+\(([^\s()]+)")
+_TRAIT_REFERENCE_RE = re.compile(r"<[a-zA-Z][a-zA-Z0-9-]*>")
+
+
+def _define_span(source, start):
+    # return the full s-expression starting at the opening paren of a define
+    depth = 0
+    for index in range(start, len(source)):
+        char = source[index]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return source[start : index + 1]
+    return source[start:]
+
+
+@lru_cache(maxsize=32)
+def parse_contract_functions(source):
+    """Build a JSON function inventory from Clarity source with a regex scan.
+
+    Symbolic questions like "which functions take traits" or "which use
+    as-contract" are answered deterministically here, so the classification
+    tasks start from a compact inventory instead of re-deriving the function
+    list from the raw source on every run.
+    """
+    functions = []
+    for match in _DEFINE_FUNCTION_RE.finditer(source):
+        visibility, name = match.groups()
+        body = _define_span(source, match.start())
+        functions.append(
+            {
+                "name": name,
+                "visibility": visibility,
+                "uses_trait": bool(_TRAIT_REFERENCE_RE.search(body)),
+                "uses_as_contract": "(as-contract" in body,
+            }
+        )
+    return json.dumps({"functions": functions}, indent=2)
+
+
+def estimate_token_count(text):
+    """Rough token count used to pre-size prompts before kickoff."""
+    try:
+        from litellm import token_counter
+
+        return token_counter(text=text)
+    except Exception:
+        # litellm's counter may lack tokenizer data for the active model;
+        # ~4 characters per token is close enough for a budget check
+        return len(text) // 4
+
+
+# principal address followed by a contract name; compiled once so typos
+# are rejected before any crew spend
+_CONTRACT_IDENTIFIER_RE = re.compile(
+    r"^(S[PMNT][0-9A-HJ-NP-Z]{26,39})\.([a-zA-Z][a-zA-Z0-9_-]{0,39})$"
+)
+
+
 def parse_contract_identifier(identifier):
-    parts = identifier.split(".")
-    if len(parts) == 2:
-        return parts[0], parts[1]
+    match = _CONTRACT_IDENTIFIER_RE.match(identifier or "")
+    if match:
+        return match.groups()
     return None, None
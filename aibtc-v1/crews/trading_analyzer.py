@@ -1,7 +1,6 @@
-import inspect
 import streamlit as st
 from crewai import Agent, Task
-from crewai_tools import tool, Tool
+from crewai_tools import tool
 from textwrap import dedent
 from utils.crews import AIBTC_Crew, display_token_usage
 import requests
@@ -231,11 +230,10 @@ class AgentTools:
 
     @classmethod
     def get_all_tools(cls):
-        members = inspect.getmembers(cls)
-        tools = [
-            member
-            for name, member in members
-            if isinstance(member, Tool)
-            or (hasattr(member, "__wrapped__") and isinstance(member.__wrapped__, Tool))
+        # explicit registry instead of an inspect.getmembers scan,
+        # which instantiated every class attribute on each call
+        return [
+            cls.get_crypto_price_history,
+            cls.get_all_swaps,
+            cls.get_pool_volume,
         ]
-        return tools
@@ -1,14 +1,9 @@
-import inspect
 import streamlit as st
 from crewai import Agent, Task
 from crewai.agents.parser import AgentAction
 from crewai.tasks.task_output import TaskOutput
-from crewai_tools import tool, Tool
+from crewai_tools import tool
 from textwrap import dedent
-from crews.smart_contract_analyzer_v2 import SmartContractAnalyzerV2
-from crews.wallet_summarizer import WalletSummaryCrew
-from crews.trading_analyzer import TradingAnalyzerCrew
-from crews.clarity_code_generator_v2 import ClarityCodeGeneratorCrewV2
 from utils.crews import AIBTC_Crew
 from utils.scripts import get_pretty_timestamp
 
@@ -125,7 +120,10 @@ class UserChatSpecialistCrew(AIBTC_Crew):
         return AgentTools.get_all_tools()
 
 
+@st.fragment
 def render_crew():
+    # scoped as a fragment so chat interactions rerun only this block,
+    # not the full page (CSS, logo, session setup) in app.py
     # setup and display initial instructions
     initial_instructions = st.empty()
     initial_instructions.markdown(
@@ -236,6 +234,8 @@ class AgentTools:
         try:
             if isinstance(contract_identifier, dict):
                 contract_identifier = contract_identifier.get("contract_identifier", "")
+            from crews.smart_contract_analyzer_v2 import SmartContractAnalyzerV2
+
             crew_class = SmartContractAnalyzerV2(st.session_state.embedder)
             crew_class.setup_agents(st.session_state.llm)
             crew_class.setup_tasks(contract_identifier)
@@ -258,6 +258,8 @@ class AgentTools:
             # check if address is json param and extract value
             if isinstance(address, dict):
                 address = address.get("address", "")
+            from crews.wallet_summarizer import WalletSummaryCrew
+
             crew_class = WalletSummaryCrew(st.session_state.embedder)
             crew_class.setup_agents(st.session_state.llm)
             crew_class.setup_tasks(address)
@@ -279,6 +281,8 @@ class AgentTools:
         try:
             if isinstance(crypto_symbol, dict):
                 crypto_symbol = crypto_symbol.get("crypto_symbol", "")
+            from crews.trading_analyzer import TradingAnalyzerCrew
+
             crew_class = TradingAnalyzerCrew(st.session_state.embedder)
             crew_class.setup_agents(st.session_state.llm)
             crew_class.setup_tasks(crypto_symbol)
@@ -300,6 +304,8 @@ class AgentTools:
         try:
             if isinstance(user_input, dict):
                 user_input = user_input.get("user_input", "")
+            from crews.clarity_code_generator_v2 import ClarityCodeGeneratorCrewV2
+
             crew_class = ClarityCodeGeneratorCrewV2(st.session_state.embedder)
             crew_class.setup_agents(st.session_state.llm)
             crew_class.setup_tasks(user_input)
@@ -332,11 +338,13 @@ class AgentTools:
 
     @classmethod
     def get_all_tools(cls):
-        members = inspect.getmembers(cls)
-        tools = [
-            member
-            for name, member in members
-            if isinstance(member, Tool)
-            or (hasattr(member, "__wrapped__") and isinstance(member.__wrapped__, Tool))
+        # explicit registry instead of an inspect.getmembers scan,
+        # which instantiated every class attribute on each call
+        return [
+            cls.execute_smart_contract_analyzer_crew,
+            cls.execute_wallet_analyzer_crew,
+            cls.execute_trading_analyzer_crew,
+            cls.execute_clarity_code_generator_crew,
+            cls.get_all_past_messages,
+            cls.get_all_available_tools,
         ]
-        return tools
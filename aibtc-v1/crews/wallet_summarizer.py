@@ -1,7 +1,6 @@
-import inspect
 import streamlit as st
 from crewai import Agent, Task
-from crewai_tools import tool, Tool
+from crewai_tools import tool
 from textwrap import dedent
 from utils.crews import AIBTC_Crew, display_token_usage
 from utils.scripts import BunScriptRunner, get_timestamp
@@ -226,11 +225,10 @@ class AgentTools:
 
     @classmethod
     def get_all_tools(cls):
-        members = inspect.getmembers(cls)
-        tools = [
-            member
-            for name, member in members
-            if isinstance(member, Tool)
-            or (hasattr(member, "__wrapped__") and isinstance(member.__wrapped__, Tool))
+        # explicit registry instead of an inspect.getmembers scan,
+        # which instantiated every class attribute on each call
+        return [
+            cls.get_address_balance_detailed,
+            cls.get_address_transactions,
+            cls.get_bns_address,
         ]
-        return tools
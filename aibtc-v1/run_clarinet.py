@@ -61,18 +61,19 @@ class ClarinetExecutor:
                 f"Clarinet binary not found at {cls.CLARINET_BIN_PATH}"
             )
 
-        # source the clarinet-config file
+        # source the clarinet-config file into a local copy of the
+        # environment; mutating os.environ is process-global and races
+        # with Streamlit's concurrent script threads
+        env = os.environ.copy()
         with open(cls.CLARINET_CONFIG_FILE, "r") as config_file:
             for line in config_file:
                 if line.startswith("export"):
                     key, value = line.strip().split("=", 1)
                     key = key.split()[-1]  # remove 'export' from the key
-                    os.environ[key] = value.strip('"')
-
-        # copy the environment variables
-        env = os.environ.copy()
+                    env[key] = value.strip('"')
 
-        # run the command
+        # run the command with a timeout so a stuck Clarinet process
+        # cannot hang the calling script thread indefinitely
         args = [cls.CLARINET_BIN_PATH] + command
         return subprocess.run(
             args,
@@ -81,4 +82,5 @@ class ClarinetExecutor:
             env=env,
             capture_output=True,
             text=True,
+            timeout=30,
         )
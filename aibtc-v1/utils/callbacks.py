@@ -1,7 +1,25 @@
+import threading
 import streamlit as st
 from typing import Dict, Any, Union
 from crewai.tasks.task_output import TaskOutput
 from crewai.agents.parser import AgentAction
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# crewai runs async tasks on plain worker threads, which carry no Streamlit
+# ScriptRunContext and therefore cannot touch st.session_state or the UI
+# containers; callbacks fired from those threads buffer their payloads here
+# and the next callback (or an explicit flush) on the script thread renders
+# them in arrival order
+_buffer_lock = threading.Lock()
+_pending_steps = []
+_pending_tasks = []
+
+
+def _take_pending(buffer):
+    with _buffer_lock:
+        items = buffer[:]
+        buffer.clear()
+    return items
 
 
 def format_task_output(task_output: TaskOutput) -> str:
@@ -12,14 +30,10 @@ def format_task_output(task_output: TaskOutput) -> str:
     if task_output.expected_output:
         output += f"**Expected Output**: {task_output.expected_output}\n\n"
 
-    # output += f"**Output Format**: {task_output.output_format.value}\n\n"
-
-    # if task_output.output_format.value == "JSON":
-    #    output += f"**JSON Output**:\n```json\n{task_output.json}\n```\n\n"
-    # elif task_output.pydantic:
-    #    output += f"**Structured Output**:\n```\n{task_output.pydantic}\n```\n\n"
-    # else:
-    #    output += f"**Raw Output**:\n{task_output.raw}\n\n"
+    # stream the actual task output as soon as it is available,
+    # instead of making the user wait for the final report
+    if task_output.raw:
+        output += f"**Raw Output**:\n\n{task_output.raw}\n\n"
 
     return output
 
@@ -34,10 +48,7 @@ def format_agent_action(agent_action: AgentAction) -> str:
     return output
 
 
-def crew_step_callback(step: Union[Dict[str, Any], AgentAction]):
-    if "crew_step_callback" not in st.session_state:
-        st.session_state.crew_step_callback = []
-    st.session_state.crew_step_callback.append(step)
+def _render_steps():
     with st.session_state.crew_step_container.container():
         with st.expander("Completed Steps", expanded=False):
             for i, step_data in enumerate(st.session_state.crew_step_callback):
@@ -53,10 +64,7 @@ def crew_step_callback(step: Union[Dict[str, Any], AgentAction]):
                     st.markdown("---")
 
 
-def crew_task_callback(task: TaskOutput):
-    if "crew_task_callback" not in st.session_state:
-        st.session_state.crew_task_callback = []
-    st.session_state.crew_task_callback.append(task)
+def _render_tasks():
     with st.session_state.crew_task_container.container():
         with st.expander("Completed Tasks", expanded=True):
             for i, task_output in enumerate(st.session_state.crew_task_callback):
@@ -64,3 +72,50 @@ def crew_task_callback(task: TaskOutput):
                 st.markdown(format_task_output(task_output))
                 if i < len(st.session_state.crew_task_callback) - 1:
                     st.markdown("---")
+
+
+def crew_step_callback(step: Union[Dict[str, Any], AgentAction]):
+    if get_script_run_ctx() is None:
+        # worker thread: stash the step for the script thread to render
+        with _buffer_lock:
+            _pending_steps.append(step)
+        return
+    if "crew_step_callback" not in st.session_state:
+        st.session_state.crew_step_callback = []
+    st.session_state.crew_step_callback.extend(_take_pending(_pending_steps))
+    st.session_state.crew_step_callback.append(step)
+    _render_steps()
+
+
+def crew_task_callback(task: TaskOutput):
+    if get_script_run_ctx() is None:
+        # worker thread: stash the task output for the script thread to render
+        with _buffer_lock:
+            _pending_tasks.append(task)
+        return
+    if "crew_task_callback" not in st.session_state:
+        st.session_state.crew_task_callback = []
+    st.session_state.crew_task_callback.extend(_take_pending(_pending_tasks))
+    st.session_state.crew_task_callback.append(task)
+    _render_tasks()
+
+
+def flush_crew_callbacks():
+    """Render anything still buffered by callbacks fired off the script thread.
+
+    Call after kickoff returns so outputs from trailing async tasks are not
+    lost when no later sync-task callback runs to drain the buffers.
+    """
+    steps = _take_pending(_pending_steps)
+    if steps:
+        if "crew_step_callback" not in st.session_state:
+            st.session_state.crew_step_callback = []
+        st.session_state.crew_step_callback.extend(steps)
+        _render_steps()
+
+    tasks = _take_pending(_pending_tasks)
+    if tasks:
+        if "crew_task_callback" not in st.session_state:
+            st.session_state.crew_task_callback = []
+        st.session_state.crew_task_callback.extend(tasks)
+        _render_tasks()
@@ -1,14 +1,26 @@
+import hashlib
+import logging
 import os
+import shlex
 import subprocess
 import shutil
 
+logger = logging.getLogger(__name__)
+
 
 class ClarinetInterface:
+    # bound each Clarinet run so a stuck process cannot hang the agent,
+    # and cap captured output so LLM context and UI payloads stay small
+    COMMAND_TIMEOUT = 30
+    MAX_OUTPUT_CHARS = 8192
+
     def __init__(self):
         self.env = os.environ.copy()
         self.clarinet_binary = None
         self.project_dir = None
         self.working_dir = None
+        # memoized syntax check results keyed by contract source digest
+        self.check_cache = {}
 
     def initialize_clarinet(self):
         # Setup Clarinet configuration
@@ -29,7 +41,7 @@ class ClarinetInterface:
 
         if self.clarinet_binary:
             # Clarinet is installed globally
-            print(f"Using global Clarinet binary at {self.clarinet_binary}")
+            logger.debug("Using global Clarinet binary at %s", self.clarinet_binary)
         else:
             # Clarinet is not installed globally, check for local installation
             self.setup_paths(project_root)
@@ -38,11 +50,11 @@ class ClarinetInterface:
                 raise FileNotFoundError(
                     f"Clarinet binary not found at {self.clarinet_binary}. Please install Clarinet."
                 )
-            print(f"Using local Clarinet binary at {self.clarinet_binary}")
+            logger.debug("Using local Clarinet binary at %s", self.clarinet_binary)
 
             # If we're on Replit, set LD_LIBRARY_PATH
             if os.environ.get("REPL_ID"):
-                print(
+                logger.debug(
                     "Detected Replit environment. Setting LD_LIBRARY_PATH for patched Clarinet."
                 )
                 self.update_environment()
@@ -55,15 +67,15 @@ class ClarinetInterface:
                 )
             else:
                 # Not on Replit, LD_LIBRARY_PATH is not needed
-                print(
+                logger.debug(
                     "Not running on Replit. LD_LIBRARY_PATH is not required for local Clarinet."
                 )
 
     def find_project_root(self):
         clarinet_script_dir = os.path.dirname(os.path.abspath(__file__))
-        print(f"Clarinet script directory: {clarinet_script_dir}")
+        logger.debug("Clarinet script directory: %s", clarinet_script_dir)
         project_root = os.path.dirname(os.path.dirname(clarinet_script_dir))
-        print(f"Project root directory: {project_root}")
+        logger.debug("Project root directory: %s", project_root)
         return project_root
 
     def setup_clarinet_config(self):
@@ -97,21 +109,74 @@ class ClarinetInterface:
         self.project_dir = os.path.join(self.working_dir, project_name)
         # Ensure the working directory exists
         os.makedirs(self.working_dir, exist_ok=True)
+        # Reuse an existing scaffold instead of spawning `clarinet new` again
+        if os.path.exists(os.path.join(self.project_dir, "Clarinet.toml")):
+            return {
+                "stdout": f"Reusing existing Clarinet project: {project_name}",
+                "stderr": "",
+                "returncode": 0,
+            }
         # Create the project
         cmd = [self.clarinet_binary, "new", project_name]
         return self.run_command(cmd, cwd=self.working_dir)
 
     def run_command(self, command, cwd=None):
-        result = subprocess.run(
-            command,
-            cwd=cwd or self.project_dir,
-            env=self.env,
-            capture_output=True,
-            text=True,
+        try:
+            result = subprocess.run(
+                command,
+                cwd=cwd or self.project_dir,
+                env=self.env,
+                capture_output=True,
+                text=True,
+                timeout=self.COMMAND_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            return {
+                "stdout": "",
+                "stderr": f"Command timed out after {self.COMMAND_TIMEOUT} seconds: {' '.join(command)}",
+                "returncode": 1,
+            }
+        return {
+            "stdout": result.stdout[: self.MAX_OUTPUT_CHARS],
+            "stderr": result.stderr[: self.MAX_OUTPUT_CHARS],
+            "returncode": result.returncode,
+        }
+
+    def create_project_with_contract(self, project_name, contract_name, contract_code):
+        # batch scaffold + contract registration + code write into a single
+        # shell invocation so only one child process is spawned
+        self.project_dir = os.path.join(self.working_dir, project_name)
+        os.makedirs(self.working_dir, exist_ok=True)
+        binary = shlex.quote(self.clarinet_binary)
+        steps = []
+        if not os.path.exists(os.path.join(self.project_dir, "Clarinet.toml")):
+            steps.append(f"{binary} new {shlex.quote(project_name)}")
+        steps.append(f"cd {shlex.quote(project_name)}")
+        contract_file = os.path.join(
+            self.project_dir, "contracts", f"{contract_name}.clar"
         )
+        if not os.path.exists(contract_file):
+            steps.append(f"{binary} contract new {shlex.quote(contract_name)}")
+        steps.append(f"cat > contracts/{shlex.quote(contract_name)}.clar")
+        try:
+            result = subprocess.run(
+                ["bash", "-c", " && ".join(steps)],
+                input=contract_code,
+                cwd=self.working_dir,
+                env=self.env,
+                capture_output=True,
+                text=True,
+                timeout=self.COMMAND_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            return {
+                "stdout": "",
+                "stderr": f"Command timed out after {self.COMMAND_TIMEOUT} seconds while setting up project '{project_name}'",
+                "returncode": 1,
+            }
         return {
-            "stdout": result.stdout,
-            "stderr": result.stderr,
+            "stdout": result.stdout[: self.MAX_OUTPUT_CHARS],
+            "stderr": result.stderr[: self.MAX_OUTPUT_CHARS],
             "returncode": result.returncode,
         }
 
@@ -144,13 +209,47 @@ class ClarinetInterface:
         cmd = [self.clarinet_binary, "contract", "rm", contract_name]
         return self.run_command(cmd)
 
+    def contracts_digest(self, contract_name=None):
+        # hash the contract sources so an unchanged project can skip the
+        # Clarinet subprocess entirely on repeat checks
+        contracts_dir = os.path.join(self.project_dir, "contracts")
+        if not os.path.isdir(contracts_dir):
+            return None
+        if contract_name:
+            filenames = [f"{contract_name}.clar"]
+        else:
+            filenames = sorted(os.listdir(contracts_dir))
+        hasher = hashlib.sha1()
+        for filename in filenames:
+            file_path = os.path.join(contracts_dir, filename)
+            if not os.path.isfile(file_path):
+                return None
+            hasher.update(filename.encode())
+            with open(file_path, "rb") as f:
+                hasher.update(f.read())
+        return hasher.hexdigest()
+
     def check_all_contracts(self):
+        digest = self.contracts_digest()
+        cache_key = ("all", digest)
+        if digest and cache_key in self.check_cache:
+            return self.check_cache[cache_key]
         cmd = [self.clarinet_binary, "check"]
-        return self.run_command(cmd)
+        result = self.run_command(cmd)
+        if digest:
+            self.check_cache[cache_key] = result
+        return result
 
     def check_contract(self, contract_name):
+        digest = self.contracts_digest(contract_name)
+        cache_key = (contract_name, digest)
+        if digest and cache_key in self.check_cache:
+            return self.check_cache[cache_key]
         cmd = [self.clarinet_binary, "check", contract_name]
-        return self.run_command(cmd)
+        result = self.run_command(cmd)
+        if digest:
+            self.check_cache[cache_key] = result
+        return result
 
     def add_requirement(self, contract_id):
         cmd = [self.clarinet_binary, "requirements", "add", contract_id]
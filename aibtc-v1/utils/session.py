@@ -20,6 +20,18 @@ def load_env_vars():
     return env_vars
 
 
+@st.cache_resource
+def get_llm(model: str, api_key: str, api_base: str, max_tokens: int, timeout: int) -> LLM:
+    # cached so the client is built once and shared across reruns/sessions
+    return LLM(
+        model=model,
+        api_key=api_key,
+        base_url=api_base,
+        max_tokens=max_tokens,
+        timeout=timeout,
+    )
+
+
 def init_session_state():
     env_vars = load_env_vars()
 
@@ -40,6 +52,8 @@ def init_session_state():
         "api_key": env_vars.get("OPENAI_API_KEY", ""),
         "api_base": env_vars.get("OPENAI_API_BASE", "https://api.openai.com/v1"),
         "model": env_vars.get("OPENAI_MODEL_NAME", "gpt-4o-mini"),
+        "llm_max_tokens": int(env_vars.get("OPENAI_MAX_TOKENS", "4096")),
+        "llm_timeout": int(env_vars.get("OPENAI_TIMEOUT", "120")),
         "embedder_provider": env_vars.get("OPENAI_EMBEDDER_PROVIDER", "openai"),
         "embedder_model": env_vars.get(
             "OPENAI_EMBEDDER_MODEL", "text-embedding-3-small"
@@ -52,10 +66,12 @@ def init_session_state():
 
     # Initialize the LLMs
     if "llm" not in st.session_state:
-        st.session_state.llm = LLM(
-            model=st.session_state.model,
-            api_key=st.session_state.api_key,
-            base_url=st.session_state.api_base,
+        st.session_state.llm = get_llm(
+            st.session_state.model,
+            st.session_state.api_key,
+            st.session_state.api_base,
+            st.session_state.llm_max_tokens,
+            st.session_state.llm_timeout,
         )
         st.session_state.embedder = {
             "provider": st.session_state.embedder_provider,
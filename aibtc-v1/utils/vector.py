@@ -1,25 +1,86 @@
+import hashlib
 import os
+import sqlite3
+import numpy as np
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from bs4 import BeautifulSoup
 from crewai_tools import Tool
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from litellm import embedding
-from chromadb import Client as ChromaClient
-from chromadb.config import Settings
 import chromadb
-import streamlit as st
 
 load_dotenv()
 
+# one session for all book fetches: keep-alive skips the per-URL TCP/TLS
+# handshake; requests already advertises exactly the compressed encodings
+# it can decode, so Accept-Encoding is left alone
+_session = requests.Session()
+_session.headers.update({"User-Agent": "aibtc-clarity-indexer/1.0"})
+
+
+# embeddings are pure functions of (model, text), so identical chunks --
+# including re-indexed pages and the chapter shared by both book stores --
+# are paid for once and read from disk afterwards
+EMBED_CACHE_PATH = "./.embedcache.sqlite"
+
+# how many records to write to Chroma per add() call
+ADD_BATCH_SIZE = 256
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of embedding vectors."""
+
+    def __init__(self, path=EMBED_CACHE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(model_name, text):
+        return hashlib.sha256(
+            model_name.encode() + b"\0" + text.encode()
+        ).hexdigest()
+
+    def get(self, model_name, text):
+        row = self.conn.execute(
+            "SELECT vec FROM embeddings WHERE key = ?",
+            (self.key(model_name, text),),
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def put_many(self, model_name, texts, vectors):
+        rows = [
+            (self.key(model_name, text), np.asarray(vec, dtype=np.float32).tobytes())
+            for text, vec in zip(texts, vectors)
+        ]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)", rows
+        )
+        self.conn.commit()
+
 
 class AIBTCEmbeddings:
     """A class to get embeddings using LiteLLM."""
 
-    def __init__(self):
+    # how many embedding requests to keep in flight at once
+    MAX_IN_FLIGHT = 4
+
+    def __init__(self, batch_size=None):
         self.model_name = os.getenv("OPENAI_EMBEDDER_MODEL", "text-embedding-3-small")
+        # how many texts to send per embedding request; large corpora are
+        # split into sub-batches of this size and the results concatenated
+        self.batch_size = batch_size or int(
+            os.getenv("OPENAI_EMBED_BATCH_SIZE", "128")
+        )
+        self.cache = EmbeddingCache()
 
     def get_embedding(self, text):
         """Retrieve embeddings for a given text using LiteLLM."""
@@ -28,28 +89,96 @@ class AIBTCEmbeddings:
             raise Exception(f"Failed to get embeddings: {response}")
         return response["data"][0]["embedding"]
 
+    def _embed_one_batch(self, batch):
+        try:
+            response = embedding(model=self.model_name, input=batch)
+        except Exception:
+            # the provider rejected or timed out on this window; halve it
+            # and retry each half until it succeeds or a single text fails
+            if len(batch) <= 1:
+                raise
+            middle = len(batch) // 2
+            return self._embed_one_batch(batch[:middle]) + self._embed_one_batch(
+                batch[middle:]
+            )
+        if not response or "data" not in response or not response["data"]:
+            raise Exception(f"Failed to get embeddings: {response}")
+        return [item["embedding"] for item in response["data"]]
+
+    def _embed_uncached(self, texts):
+        """Embed texts with one LiteLLM call per sub-batch, bypassing the cache.
+
+        Sub-batches are submitted concurrently and the results reassembled
+        in input order.
+        """
+        batches = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) <= 1:
+            return self._embed_one_batch(texts) if texts else []
+        with ThreadPoolExecutor(
+            max_workers=min(self.MAX_IN_FLIGHT, len(batches))
+        ) as pool:
+            results = list(pool.map(self._embed_one_batch, batches))
+        return [vec for batch in results for vec in batch]
+
+    def embed_batch(self, texts):
+        """Embed a batch of texts, serving cached vectors where possible.
+
+        Returns a float32 numpy array of shape (N, D); a single contiguous
+        buffer is ~7x smaller than nested lists of boxed Python floats and
+        is what Chroma stores internally anyway.
+        """
+        results = [None] * len(texts)
+        misses = []
+        for index, text in enumerate(texts):
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                results[index] = cached
+            else:
+                misses.append(index)
+        if misses:
+            miss_texts = [texts[index] for index in misses]
+            vectors = self._embed_uncached(miss_texts)
+            self.cache.put_many(self.model_name, miss_texts, vectors)
+            for index, vec in zip(misses, vectors):
+                results[index] = vec
+        return np.asarray(results, dtype=np.float32)
+
     def embed_documents(self, texts):
         """Embed a list of texts (documents) using LiteLLM."""
-        return [self.get_embedding(text) for text in texts]
+        # one request per sub-batch instead of one request per text
+        return self.embed_batch(texts)
 
     def embed_query(self, query):
         """Embed a single query string using LiteLLM."""
         return self.get_embedding(query)
 
 
+@lru_cache(maxsize=None)
+def _get_embedder():
+    # one embedder (and one sqlite cache connection) shared by every
+    # vector store build and search tool
+    return AIBTCEmbeddings()
+
+
 def fetch_clarity_book_content(website_url: str):
     """Fetch and parse the content of the provided URL using Beautiful Soup. Targets the main article content."""
-    response = requests.get(website_url)
-    soup = BeautifulSoup(response.content, "html.parser")
+    response = _session.get(website_url, timeout=(5, 30))
+    # lxml parses several times faster than the pure-Python html.parser,
+    # and find/find_all skip the soupsieve CSS selector engine
+    soup = BeautifulSoup(response.content, "lxml")
 
-    article = soup.select_one("section#article article")
+    section = soup.find("section", id="article")
+    article = section.find("article") if section else None
     if not article:
         return ""
 
     title = article.find("h2")
     title_text = title.text if title else ""
 
-    for element in article.select(".code, .buttons"):
+    for element in article.find_all(class_=("code", "buttons")):
         element.decompose()
 
     content = article.get_text(separator="\n", strip=True)
@@ -59,69 +188,160 @@ def fetch_clarity_book_content(website_url: str):
     return full_content
 
 
-def create_vector_store(urls, chunk_size=1000, chunk_overlap=200):
-    """Create a vector store from a list of URLs using LiteLLM embeddings."""
-    documents = []
-    for url in urls:
-        content = fetch_clarity_book_content(url)
-        documents.append(Document(page_content=content, metadata={"source": url}))
+@lru_cache(maxsize=8)
+def _get_splitter(chunk_size, chunk_overlap):
+    # the splitter compiles its separator regexes at construction; reuse
+    # one instance per (chunk_size, chunk_overlap) pair. Lengths are
+    # counted with tiktoken (Rust-backed, already pulled in by litellm)
+    # so chunk sizes line up with what the embedding model bills for
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
 
-    # Split the documents into smaller chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+
+def create_vector_store(urls, chunk_size=512, chunk_overlap=64, persist=False):
+    """Create a vector store from a list of URLs using LiteLLM embeddings.
+
+    chunk_size and chunk_overlap are denominated in tokens, not characters.
+    With persist=False the collection lives in memory only, skipping
+    SQLite commits on every add; pass persist=True to write to ./chroma
+    and reuse the collection across processes.
+    """
+    # Initialize AIBTCEmbeddings
+    aibtc_embeddings = _get_embedder()
+
+    # Collections are named after their build inputs, so an existing
+    # collection built from the same URLs, splitter params, and model is
+    # reused without fetching or embedding anything
+    manifest = hashlib.sha256(
+        repr(
+            (sorted(urls), aibtc_embeddings.model_name, chunk_size, chunk_overlap)
+        ).encode()
+    ).hexdigest()[:16]
+    collection_name = f"clarity_{manifest}"
+
+    chroma_client = (
+        chromadb.PersistentClient(path="./chroma")
+        if persist
+        else chromadb.EphemeralClient()
     )
+    try:
+        return chroma_client.get_collection(collection_name)
+    except Exception:
+        pass
+
+    # fetch the pages concurrently so wall time is the slowest request
+    # instead of the sum of all of them
+    with ThreadPoolExecutor(max_workers=min(10, len(urls))) as pool:
+        contents = list(pool.map(fetch_clarity_book_content, urls))
+    documents = [
+        Document(page_content=content, metadata={"source": url})
+        for url, content in zip(urls, contents)
+    ]
+
+    # Split the documents into smaller chunks
+    text_splitter = _get_splitter(chunk_size, chunk_overlap)
     splits = text_splitter.split_documents(documents)
 
-    # Initialize AIBTCEmbeddings
-    aibtc_embeddings = AIBTCEmbeddings()
+    # Build the parallel lists Chroma and the embedder both want in a
+    # single pass over the splits
+    texts, metas = [], []
+    for doc in splits:
+        texts.append(doc.page_content)
+        metas.append(doc.metadata)
+    ids = list(map(str, range(len(splits))))
 
-    # Create embeddings for each document chunk
-    embeddings = aibtc_embeddings.embed_documents([doc.page_content for doc in splits])
+    # Embed each distinct chunk once; overlapping splits and pages shared
+    # between stores routinely produce byte-identical chunks
+    unique_index = {}
+    unique_texts = []
+    for text in texts:
+        if text not in unique_index:
+            unique_index[text] = len(unique_texts)
+            unique_texts.append(text)
+    unique_embeddings = aibtc_embeddings.embed_documents(unique_texts)
 
-    # Create a new Chroma client
-    chroma_client = chromadb.PersistentClient(path="./chroma")
+    # Fan the unique vectors back out to every occurrence (fancy indexing
+    # keeps the result a single float32 matrix)
+    embeddings = unique_embeddings[[unique_index[text] for text in texts]]
+
+    # normalize once at ingest so inner-product search is cosine search
+    # without per-query renormalization
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
 
     # Create or get a collection in Chroma for storing embeddings
-    collection = chroma_client.get_or_create_collection(name="example_collection")
-
-    # Add the document chunks, metadata, and their embeddings to the Chroma collection
-    collection.add(
-        documents=[doc.page_content for doc in splits],
-        metadatas=[doc.metadata for doc in splits],
-        ids=[str(i) for i in range(len(splits))],
-        embeddings=embeddings,
+    collection = chroma_client.get_or_create_collection(
+        name=collection_name, metadata={"hnsw:space": "ip"}
     )
 
+    # Add the document chunks, metadata, and their embeddings to the Chroma
+    # collection in bounded batches so one giant payload never has to be
+    # serialized in a single call
+    for start in range(0, len(splits), ADD_BATCH_SIZE):
+        stop = start + ADD_BATCH_SIZE
+        collection.add(
+            documents=texts[start:stop],
+            metadatas=metas[start:stop],
+            ids=ids[start:stop],
+            embeddings=embeddings[start:stop],
+        )
+
     return collection
 
 
 def create_vector_search_tool(vector_store, name, description):
     """Create a vector search tool using the given vector store."""
+    embedder = _get_embedder()
+
+    @lru_cache(maxsize=1024)
+    def _query_embedding(query):
+        # agent loops repeat queries verbatim, so hot queries skip the
+        # embedding call entirely; normalized to match the unit vectors
+        # stored at ingest
+        vec = np.asarray(embedder.embed_query(query), dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
 
     def search_func(query: str):
-        results = vector_store.similarity_search(query, k=3)
-        return "\n\n".join(
-            f"From {doc.metadata['source']}:\n{doc.page_content}" for doc in results
+        # query the chromadb collection directly with the precomputed
+        # vector; Collection objects have no langchain similarity_search
+        results = vector_store.query(
+            query_embeddings=[_query_embedding(query)], n_results=3
         )
+        # build the response in one flat parts list and a single join,
+        # avoiding an intermediate f-string per result
+        parts = []
+        for meta, text in zip(results["metadatas"][0], results["documents"][0]):
+            parts.extend(("From ", meta["source"], ":\n", text, "\n\n"))
+        return "".join(parts).rstrip()
 
     return Tool(name=name, func=search_func, description=description)
 
 
 # Define the URLs for different sections of the Clarity book
-clarity_book_code_vector_store = create_vector_store(
-    [
-        "https://book.clarity-lang.org/ch04-00-storing-data.html",
-        "https://book.clarity-lang.org/ch05-00-functions.html",
-        "https://book.clarity-lang.org/ch03-00-keywords.html",
-        "https://book.clarity-lang.org/ch02-00-types.html",
-    ]
-)
-
-clarity_book_function_vector_store = create_vector_store(
-    [
-        "https://book.clarity-lang.org/ch05-00-functions.html",
-        "https://book.clarity-lang.org/ch05-01-public-functions.html",
-        "https://book.clarity-lang.org/ch05-02-private-functions.html",
-        "https://book.clarity-lang.org/ch05-03-read-only-functions.html",
-    ]
-)
+CLARITY_BOOK_CODE_URLS = [
+    "https://book.clarity-lang.org/ch04-00-storing-data.html",
+    "https://book.clarity-lang.org/ch05-00-functions.html",
+    "https://book.clarity-lang.org/ch03-00-keywords.html",
+    "https://book.clarity-lang.org/ch02-00-types.html",
+]
+
+CLARITY_BOOK_FUNCTION_URLS = [
+    "https://book.clarity-lang.org/ch05-00-functions.html",
+    "https://book.clarity-lang.org/ch05-01-public-functions.html",
+    "https://book.clarity-lang.org/ch05-02-private-functions.html",
+    "https://book.clarity-lang.org/ch05-03-read-only-functions.html",
+]
+
+
+# the stores are built on first use rather than at import, so importing
+# this module stays cheap and never touches the network
+@lru_cache(maxsize=None)
+def get_clarity_book_code_vector_store():
+    return create_vector_store(CLARITY_BOOK_CODE_URLS, persist=True)
+
+
+@lru_cache(maxsize=None)
+def get_clarity_book_function_vector_store():
+    return create_vector_store(CLARITY_BOOK_FUNCTION_URLS, persist=True)